@@ -9,22 +9,46 @@ with comprehensive airport data from a public CSV source.
 import sys
 import os
 import json
+import logging
+import math
+import mmap
 import csv
 import io
+import pickle
 import asyncio
-from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any, Tuple
+import heapq
+import re
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from calendar import monthrange
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from operator import itemgetter
+from typing import Optional, List, Dict, Any, Tuple, Union
 from pathlib import Path
 
-# Print debug info to stderr (will be captured in Claude logs)
-print("Starting Flight Planner server...", file=sys.stderr)
+# Log to stderr (will be captured in Claude logs); stdout carries the MCP protocol
+log_level = (os.environ.get("LOG_LEVEL") or "WARNING").upper()
+valid_log_level = log_level in logging.getLevelNamesMapping()
+logging.basicConfig(
+    level=log_level if valid_log_level else logging.WARNING,
+    stream=sys.stderr,
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+logger = logging.getLogger("flights-mcp")
+if not valid_log_level:
+    logger.warning("Unknown LOG_LEVEL %r, using WARNING", os.environ["LOG_LEVEL"])
+logger.info("Starting Flight Planner server...")
 
 try:
     from fastmcp import FastMCP, Context
-    print("Successfully imported FastMCP", file=sys.stderr)
+    logger.debug("Successfully imported FastMCP")
 except ImportError as e:
-    print(f"Error importing FastMCP: {e}", file=sys.stderr)
-    print("Please install FastMCP with: uv pip install fastmcp", file=sys.stderr)
+    logger.critical("Error importing FastMCP: %s", e)
+    logger.critical("Please install FastMCP with: uv pip install fastmcp")
     sys.exit(1)
 
 # Constants
@@ -33,83 +57,408 @@ DEFAULT_CONFIG = {
     "max_results": 10,
     "default_trip_days": 7,
     "default_advance_days": 30,
-    "seat_classes": ["economy", "premium_economy", "business", "first"]
+    "seat_classes": ["economy", "premium-economy", "business", "first"],
+    "max_flexible_window_days": 7
 }
-AIRPORTS_CACHE_FILE = Path(__file__).parent / "airports_cache.json"
+SEAT_CLASSES = frozenset(DEFAULT_CONFIG["seat_classes"])
+SEAT_CLASS_ERROR = f"Error: Seat class must be one of {', '.join(DEFAULT_CONFIG['seat_classes'])}."
+DATE_FORMAT = "%Y-%m-%d"
+PRICE_PATTERN = re.compile(r"[0-9][0-9,]*(?:\.[0-9]+)?")
+IATA_CODE_PATTERN = re.compile(r"[A-Z]{3}")
+AIRPORTS_CACHE_FILE = Path(__file__).parent / "airports_cache.pkl"
+# JSON cache written by earlier versions; still read if the pickle cache is missing
+LEGACY_AIRPORTS_CACHE_FILE = Path(__file__).parent / "airports_cache.json"
+# Optional copy of the CSV_URL file shipped next to the server, used when there is no cache
+BUNDLED_AIRPORTS_FILE = Path(__file__).parent / "airports.csv"
+# Seconds after which a cached airports database is refreshed in the background
+AIRPORTS_CACHE_MAX_AGE = 24 * 60 * 60
+# Seconds to keep flight search results (0 disables caching); failures are kept briefly
+DEFAULT_FLIGHT_CACHE_TTL = 600.0
+try:
+    FLIGHT_CACHE_TTL = float(os.environ.get("FLIGHTS_CACHE_TTL") or DEFAULT_FLIGHT_CACHE_TTL)
+    if math.isnan(FLIGHT_CACHE_TTL):
+        raise ValueError("TTL is NaN")
+except ValueError:
+    logger.warning(
+        "Invalid FLIGHTS_CACHE_TTL %r, using %g seconds", os.environ["FLIGHTS_CACHE_TTL"], DEFAULT_FLIGHT_CACHE_TTL
+    )
+    FLIGHT_CACHE_TTL = DEFAULT_FLIGHT_CACHE_TTL
+FLIGHT_CACHE_ERROR_TTL = min(30.0, FLIGHT_CACHE_TTL)
+FLIGHT_CACHE_MAX_ENTRIES = 512
+# Attempts and initial backoff (doubled per retry) for transient network errors
+FLIGHT_FETCH_ATTEMPTS = 3
+FLIGHT_FETCH_BACKOFF = 0.3
 
 # Global variables
 airports = {}
+# fast_flights module, imported on first search (see load_fast_flights)
+fast_flights = None
+# Search index as parallel lists sorted by display line "Name (CODE)"; display lines are
+# rebuilt from airports for the few results shown instead of being kept for every airport
+airport_codes: List[str] = []
+airport_names: List[str] = []  # upper-cased
+# Inverted index from every 2- and 3-character substring of a code or name to index positions
+airport_grams: Dict[str, List[int]] = {}
+# Text of the airports://all resource, rebuilt whenever the database is replaced
+all_airports_text = "Available Airports (0 total):"
+# Held while the index is swapped or searched, since a background refresh replaces it from another thread
+airports_lock = threading.Lock()
+# Flight search outcomes keyed by normalized query, least recently used first:
+# key -> (expires_at, (text, cheapest (amount, price label) or None, succeeded))
+SearchOutcome = Tuple[str, Optional[Tuple[float, str]], bool]
+flight_cache: "OrderedDict[Tuple, Tuple[float, SearchOutcome]]" = OrderedDict()
+# Searches being fetched right now, keyed like flight_cache; concurrent identical queries await these
+pending_searches: Dict[Tuple, "asyncio.Future[SearchOutcome]"] = {}
+
+def get_cached_flights(key: Tuple) -> Optional[SearchOutcome]:
+    """Return a cached flight search outcome if it has not expired."""
+    entry = flight_cache.get(key)
+    if entry is None:
+        return None
+    expires_at, outcome = entry
+    if expires_at < time.monotonic():
+        flight_cache.pop(key, None)
+        return None
+    flight_cache.move_to_end(key)
+    return outcome
+
+def cache_flights(key: Tuple, outcome: SearchOutcome, ttl: float) -> None:
+    """Store a flight search outcome for ``ttl`` seconds."""
+    if ttl > 0:
+        flight_cache[key] = (time.monotonic() + ttl, outcome)
+        flight_cache.move_to_end(key)
+        # Evict the least recently used entries once the cache is full
+        while len(flight_cache) > FLIGHT_CACHE_MAX_ENTRIES:
+            flight_cache.popitem(last=False)
+
+# Shared HTTP sessions for airport downloads, one per event loop since a session is bound to
+# the loop it was created on (startup, the server and background refreshes each run their own)
+http_sessions: Dict[asyncio.AbstractEventLoop, Any] = {}
+
+async def get_http_session():
+    """Return the running loop's aiohttp session, creating it on first use or after it was closed."""
+    import aiohttp
+    
+    loop = asyncio.get_running_loop()
+    session = http_sessions.get(loop)
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(sock_connect=10, sock_read=30),
+            connector=aiohttp.TCPConnector(limit=100, ttl_dns_cache=300)
+        )
+        http_sessions[loop] = session
+    return session
+
+async def close_http_session() -> None:
+    """Close the running loop's aiohttp session, if any."""
+    session = http_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
+
+def parse_airports_csv(csv_bytes: Union[bytes, mmap.mmap]) -> Dict[str, str]:
+    """Parse airports CSV data (bytes or a memory-mapped file) into a mapping of IATA code to description."""
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        from pyarrow import csv as pacsv
+    except ImportError:
+        pa = None
+    
+    columns = ['iata', 'name', 'city', 'country']
+    if pa is not None:
+        # pyarrow parses in native code; fall back to the csv module if it rejects the data
+        try:
+            table = pacsv.read_csv(
+                pa.BufferReader(csv_bytes),
+                convert_options=pacsv.ConvertOptions(
+                    include_columns=columns,
+                    column_types={column: pa.string() for column in columns},
+                    strings_can_be_null=False
+                )
+            )
+            # Drop rows without a valid IATA code before converting anything to Python objects
+            table = table.filter(pc.match_substring_regex(table.column('iata'), f"^{IATA_CODE_PATTERN.pattern}$"))
+            rows = zip(*(table.column(column).to_pylist() for column in columns))
+        except pa.ArrowException as e:
+            logger.warning("pyarrow could not parse airports CSV (%s), using csv module", e)
+            pa = None
+    
+    if pa is None:
+        # Decode lazily while reading instead of materializing the whole file as a str;
+        # short rows read as empty strings
+        csv_reader = csv.DictReader(
+            io.TextIOWrapper(io.BytesIO(csv_bytes), encoding='utf-8', newline=''),
+            restval=''
+        )
+        if set(columns).issubset(csv_reader.fieldnames or ()):
+            rows = map(itemgetter(*columns), csv_reader)
+        else:
+            # Columns missing from the header read as empty strings too
+            rows = (tuple(row.get(column, '') for column in columns) for row in csv_reader)
+    
+    is_iata_code = IATA_CODE_PATTERN.fullmatch
+    intern = sys.intern
+    # Only store entries with a valid IATA code (3 uppercase letters), including city and country
+    # in the name for better context. Codes are interned so repeated loads (e.g. background
+    # refreshes) share one object per code.
+    return {
+        intern(iata): f"{name}, {city}, {country}" if city else f"{name}, {country}"
+        for iata, name, city, country in rows
+        if iata and is_iata_code(iata)
+    }
+
+def save_airports_cache(airports_data: Dict[str, str]) -> None:
+    """Write the airports cache file atomically."""
+    # Refreshes write from a daemon thread that is killed at exit, so write a temp file next to
+    # the cache and rename it into place; an interrupted write never leaves a truncated cache
+    temp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(
+            'wb', dir=AIRPORTS_CACHE_FILE.parent, prefix=AIRPORTS_CACHE_FILE.name, suffix='.tmp', delete=False
+        ) as f:
+            temp_path = f.name
+            pickle.dump(airports_data, f, protocol=5)
+        os.replace(temp_path, AIRPORTS_CACHE_FILE)
+        logger.info("Saved airports to cache file: %s", AIRPORTS_CACHE_FILE)
+    except Exception as e:
+        logger.warning("Could not save airports cache: %s", e)
+        if temp_path is not None:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
 
 # Fetch airport data from CSV
 async def fetch_airports_csv(url: str = CSV_URL) -> Dict[str, str]:
     """Fetch airport data from a CSV URL."""
-    print(f"Fetching airports from {url}", file=sys.stderr)
+    logger.info("Fetching airports from %s", url)
     
     try:
-        import aiohttp
-        
-        airports_data = {}
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                if response.status != 200:
-                    print(f"Error fetching CSV: HTTP {response.status}", file=sys.stderr)
-                    return {}
-                
-                csv_text = await response.text()
-                csv_reader = csv.DictReader(io.StringIO(csv_text))
-                
-                for row in csv_reader:
-                    iata = row.get('iata', '')
-                    name = row.get('name', '')
-                    city = row.get('city', '')
-                    country = row.get('country', '')
-                    
-                    # Only store entries with a valid IATA code (3 uppercase letters)
-                    if iata and len(iata) == 3 and iata.isalpha() and iata.isupper():
-                        # Include city and country in the name for better context
-                        full_name = f"{name}, {city}, {country}" if city else f"{name}, {country}"
-                        airports_data[iata] = full_name
-                
-                print(f"Loaded {len(airports_data)} airports from CSV", file=sys.stderr)
-                
-                # Save to cache file
-                try:
-                    with open(AIRPORTS_CACHE_FILE, 'w') as f:
-                        json.dump(airports_data, f)
-                    print(f"Saved airports to cache file: {AIRPORTS_CACHE_FILE}", file=sys.stderr)
-                except Exception as cache_e:
-                    print(f"Warning: Could not save airports cache: {cache_e}", file=sys.stderr)
-                
-                return airports_data
+        session = await get_http_session()
+        async with session.get(url) as response:
+            if response.status != 200:
+                logger.error("Error fetching CSV: HTTP %s", response.status)
+                return {}
+            
+            airports_data = parse_airports_csv(await response.read())
+            
+            logger.info("Loaded %d airports from CSV", len(airports_data))
+            
+            save_airports_cache(airports_data)
+            return airports_data
     except ImportError:
-        print("aiohttp not installed. Cannot fetch airports CSV.", file=sys.stderr)
-        print("Please install with: uv pip install aiohttp", file=sys.stderr)
+        logger.error("aiohttp not installed. Cannot fetch airports CSV.")
+        logger.error("Please install with: uv pip install aiohttp")
         return {}
     except Exception as e:
-        print(f"Error fetching airports: {e}", file=sys.stderr)
+        logger.error("Error fetching airports: %s", e)
         return {}
 
+async def noop(*args, **kwargs) -> None:
+    """Stand-in for Context logging and progress methods when no context is given."""
+
+def set_airports(airports_data: Dict[str, str]) -> None:
+    """Replace the airports database and rebuild its search index and listing."""
+    global airports, airport_codes, airport_names, airport_grams, all_airports_text
+    entries = sorted((f"{name} ({code})", code, name.upper()) for code, name in airports_data.items())
+    codes = [code for _, code, _ in entries]
+    names = [name for _, _, name in entries]
+    del entries
+    index = {}
+    for i, (code, name) in enumerate(zip(codes, names)):
+        grams = set()
+        for text in (code, name):
+            grams.update(text[j:j + 2] for j in range(len(text) - 1))
+            grams.update(text[j:j + 3] for j in range(len(text) - 2))
+        for gram in grams:
+            index.setdefault(gram, []).append(i)
+    
+    # The airports://all resource lists the first 100 codes
+    listing = [f"Available Airports ({len(airports_data)} total):"]
+    listing.extend(f"{code}: {name}" for code, name in heapq.nsmallest(100, airports_data.items()))
+    if len(airports_data) > 100:
+        listing.append(f"... and {len(airports_data) - 100} more airports. Use airport_search tool to find specific airports.")
+    
+    # Build outside the lock so searches only wait for the swap itself
+    with airports_lock:
+        airports = airports_data
+        airport_codes, airport_names, airport_grams = codes, names, index
+        all_airports_text = "\n".join(listing)
+        find_airports.cache_clear()
+
+@lru_cache(maxsize=512)
+def find_airports(query: str) -> Tuple[str, ...]:
+    """Return codes of airports whose code or name contains the upper-cased query, sorted by display line."""
+    if len(query) < 2:
+        candidates = range(len(airport_codes))
+    else:
+        # Any match must contain every gram of the query, so only check airports with the rarest one
+        n = min(len(query), 3)
+        candidates = min(
+            (airport_grams.get(query[j:j + n], ()) for j in range(len(query) - n + 1)),
+            key=len
+        )
+    
+    codes = airport_codes
+    names = airport_names
+    return tuple(codes[i] for i in candidates if query in codes[i] or query in names[i])
+
 # Load airports from cache if available
 def load_airports_cache() -> Dict[str, str]:
     """Load airports from cache file if available."""
     if AIRPORTS_CACHE_FILE.exists():
         try:
-            with open(AIRPORTS_CACHE_FILE, 'r') as f:
+            with open(AIRPORTS_CACHE_FILE, 'rb') as f:
+                cache = pickle.load(f)
+                logger.info("Loaded %d airports from cache", len(cache))
+                return cache
+        except Exception as e:
+            logger.warning("Error loading airports cache: %s", e)
+    
+    if LEGACY_AIRPORTS_CACHE_FILE.exists():
+        try:
+            with open(LEGACY_AIRPORTS_CACHE_FILE, 'rb') as f:
                 cache = json.load(f)
-                print(f"Loaded {len(cache)} airports from cache", file=sys.stderr)
+                logger.info("Loaded %d airports from legacy JSON cache", len(cache))
                 return cache
         except Exception as e:
-            print(f"Error loading airports cache: {e}", file=sys.stderr)
+            logger.warning("Error loading legacy airports cache: %s", e)
     return {}
 
+def load_bundled_airports() -> Dict[str, str]:
+    """Parse the airports CSV shipped next to the server, if there is one."""
+    if not BUNDLED_AIRPORTS_FILE.exists():
+        return {}
+    try:
+        # Map the file instead of reading it so the parser works on the page cache directly
+        with open(BUNDLED_AIRPORTS_FILE, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            airports_data = parse_airports_csv(mm)
+        logger.info("Loaded %d airports from bundled CSV", len(airports_data))
+        return airports_data
+    except Exception as e:
+        logger.warning("Error loading bundled airports CSV: %s", e)
+        return {}
+
+def airports_cache_is_fresh() -> bool:
+    """Return True if the airports cache was written within AIRPORTS_CACHE_MAX_AGE."""
+    try:
+        return time.time() - AIRPORTS_CACHE_FILE.stat().st_mtime < AIRPORTS_CACHE_MAX_AGE
+    except OSError:
+        return False
+
+def check_date(value: str) -> None:
+    """Raise ValueError unless value is a real calendar date in YYYY-MM-DD format."""
+    # The format is fixed-width, so check the separators and slice out the digits directly
+    if len(value) != 10 or value[4] != '-' or value[7] != '-' or not value.isascii():
+        raise ValueError(f"Invalid date: {value}")
+    year, month, day = value[:4], value[5:7], value[8:]
+    if not (year.isdigit() and month.isdigit() and day.isdigit()):
+        raise ValueError(f"Invalid date: {value}")
+    year, month, day = int(year), int(month), int(day)
+    if year < 1 or not 1 <= month <= 12 or not 1 <= day <= monthrange(year, month)[1]:
+        raise ValueError(f"Invalid date: {value}")
+
+def normalize_seat_class(seat_class: str) -> str:
+    """Return the seat class spelled the way fast_flights takes it (e.g. "premium-economy")."""
+    # Earlier versions documented "premium_economy", so keep accepting underscores
+    return seat_class.lower().replace("_", "-")
+
+def validate_search(
+    from_airport: str,
+    to_airport: str,
+    departure_date: str,
+    return_date: Optional[str],
+    passengers: Tuple[int, int, int, int],
+    seat_class: str
+) -> Optional[str]:
+    """Return an error message if the search parameters are invalid, otherwise None."""
+    try:
+        # Validate dates (YYYY-MM-DD strings compare in chronological order)
+        check_date(departure_date)
+        if return_date:
+            check_date(return_date)
+            if return_date < departure_date:
+                return "Error: Return date cannot be before departure date."
+    except ValueError:
+        return "Error: Invalid date format. Please use YYYY-MM-DD format."
+    
+    # Validate airport codes
+    if len(from_airport) != 3 or len(to_airport) != 3:
+        return "Error: Airport codes must be 3-letter IATA codes."
+    
+    # Check if airports exist in our database
+    if from_airport not in airports:
+        return f"Error: Departure airport code '{from_airport}' not found in our database."
+    if to_airport not in airports:
+        return f"Error: Arrival airport code '{to_airport}' not found in our database."
+    
+    # Validate passenger numbers
+    if passengers[0] < 1:
+        return "Error: At least one adult passenger is required."
+    if any(num < 0 for num in passengers):
+        return "Error: Passenger numbers cannot be negative."
+    
+    # Validate seat class
+    if seat_class.lower() not in SEAT_CLASSES:
+        return SEAT_CLASS_ERROR
+    return None
+
+def load_fast_flights():
+    """Import fast_flights on first use so server startup doesn't pay for it."""
+    global fast_flights
+    if fast_flights is None:
+        import fast_flights as module
+        fast_flights = module
+    return fast_flights
+
+@lru_cache(maxsize=1)
+def transient_fetch_errors() -> Tuple[type, ...]:
+    """Return the exception types a fast_flights fetch raises for failures worth retrying."""
+    # fast_flights asserts that Google (and its fallback service) answered 200, so rate limiting
+    # and server errors surface as AssertionError
+    errors = [ConnectionError, TimeoutError, AssertionError]
+    # It fetches through primp, whose transport errors are its own classes: ConnectionError and
+    # Timeout in primp 1.x, ConnectError, TimeoutError and DNSError in 2.x. primp 0.x raises a bare
+    # RuntimeError, the same type fast_flights uses for "No flights found", so that isn't retried.
+    try:
+        import primp
+    except ImportError:
+        return tuple(errors)
+    for name in ("ConnectionError", "Timeout", "ConnectError", "TimeoutError", "DNSError"):
+        error = getattr(primp, name, None)
+        if isinstance(error, type) and issubclass(error, Exception):
+            errors.append(error)
+    return tuple(errors)
+
+async def fetch_with_retry(fetch, **kwargs):
+    """Run a blocking fetch in a thread, retrying network errors with exponential backoff."""
+    for attempt in range(FLIGHT_FETCH_ATTEMPTS):
+        try:
+            return await asyncio.to_thread(fetch, **kwargs)
+        except transient_fetch_errors() as e:
+            if attempt == FLIGHT_FETCH_ATTEMPTS - 1:
+                raise
+            delay = FLIGHT_FETCH_BACKOFF * 2 ** attempt
+            logger.warning("Flight fetch failed (%s), retrying in %.1fs", e, delay)
+            await asyncio.sleep(delay)
+
+@asynccontextmanager
+async def server_lifespan(server):
+    """Release the server loop's HTTP session (opened by update_airports_database) on shutdown."""
+    try:
+        yield {}
+    finally:
+        await close_http_session()
+
 # Initialize the FastMCP server with dependencies
 mcp = FastMCP(
     "Flight Planner", 
-    dependencies=["fast-flights", "aiohttp"]
+    dependencies=["fast-flights", "aiohttp"],
+    lifespan=server_lifespan
 )
 
 @mcp.tool()
-def search_flights(
+async def search_flights(
     from_airport: str, 
     to_airport: str,
     departure_date: str,
@@ -119,6 +468,7 @@ def search_flights(
     infants_in_seat: int = 0,
     infants_on_lap: int = 0,
     seat_class: str = "economy",
+    parallel_legs: bool = False,
     ctx: Context = None
 ) -> str:
     """
@@ -133,163 +483,351 @@ def search_flights(
         children: Number of children (default: 0)
         infants_in_seat: Number of infants in seat (default: 0)
         infants_on_lap: Number of infants on lap (default: 0)
-        seat_class: Seat class (economy, premium_economy, business, first) (default: economy)
+        seat_class: Seat class (economy, premium-economy, business, first) (default: economy)
+        parallel_legs: For round trips, search the outbound and return legs as separate
+                       one-way trips concurrently (default: False)
 
     Returns:
         Flight search results in a formatted string
     """
     if ctx:
-        ctx.info(f"Searching flights from {from_airport} to {to_airport}")
+        await ctx.info(f"Searching flights from {from_airport} to {to_airport}")
+    
+    from_airport = from_airport.upper()
+    to_airport = to_airport.upper()
+    seat_class = normalize_seat_class(seat_class)
+    passengers = (adults, children, infants_in_seat, infants_on_lap)
     
     # Validate inputs
-    try:
-        # Validate dates
-        departure_datetime = datetime.strptime(departure_date, "%Y-%m-%d")
-        return_datetime = None
-        if return_date:
-            return_datetime = datetime.strptime(return_date, "%Y-%m-%d")
-            if return_datetime < departure_datetime:
-                return "Error: Return date cannot be before departure date."
-            
-        # Validate airport codes
-        if len(from_airport) != 3 or len(to_airport) != 3:
-            return "Error: Airport codes must be 3-letter IATA codes."
-        
-        # Check if airports exist in our database
-        from_airport = from_airport.upper()
-        to_airport = to_airport.upper()
-        
-        if from_airport not in airports:
-            return f"Error: Departure airport code '{from_airport}' not found in our database."
-        if to_airport not in airports:
-            return f"Error: Arrival airport code '{to_airport}' not found in our database."
-            
-        # Validate passenger numbers
-        if adults < 1:
-            return "Error: At least one adult passenger is required."
-        if any(num < 0 for num in [adults, children, infants_in_seat, infants_on_lap]):
-            return "Error: Passenger numbers cannot be negative."
-            
-        # Validate seat class
-        valid_classes = DEFAULT_CONFIG["seat_classes"]
-        if seat_class.lower() not in valid_classes:
-            return f"Error: Seat class must be one of {', '.join(valid_classes)}."
+    error = validate_search(from_airport, to_airport, departure_date, return_date, passengers, seat_class)
+    if error:
+        return error
+
+    outbound = (departure_date, from_airport, to_airport)
     
-    except ValueError:
-        return "Error: Invalid date format. Please use YYYY-MM-DD format."
+    if return_date and parallel_legs:
+        # Search both legs as one-way trips at the same time
+        inbound = (return_date, to_airport, from_airport)
+        outbound_text, inbound_text = await asyncio.gather(
+            run_flight_search((outbound,), "one-way", passengers, seat_class, ctx),
+            run_flight_search((inbound,), "one-way", passengers, seat_class, ctx)
+        )
+        return (
+            f"Outbound {from_airport} -> {to_airport} on {departure_date}:\n{outbound_text}\n\n"
+            f"Return {to_airport} -> {from_airport} on {return_date}:\n{inbound_text}"
+        )
+    
+    if return_date:
+        legs = (outbound, (return_date, to_airport, from_airport))
+        return await run_flight_search(legs, "round-trip", passengers, seat_class, ctx)
+    return await run_flight_search((outbound,), "one-way", passengers, seat_class, ctx)
+
+async def run_flight_search(
+    legs: Tuple[Tuple[str, str, str], ...],
+    trip_type: str,
+    passengers: Tuple[int, int, int, int],
+    seat_class: str,
+    ctx: Context = None
+) -> str:
+    """
+    Fetch and format flights for already validated search parameters.
 
-    # Import fast_flights here to avoid startup issues
+    Args:
+        legs: (date, from_airport, to_airport) per leg, with upper-cased airport codes
+        trip_type: "one-way" or "round-trip"
+        passengers: (adults, children, infants_in_seat, infants_on_lap)
+        seat_class: Seat class accepted by fast_flights
+
+    Returns:
+        Formatted flight results or an error message; both are cached
+    """
+    text, _, _ = await get_flight_search(legs, trip_type, passengers, seat_class, ctx)
+    return text
+
+async def get_flight_search(
+    legs: Tuple[Tuple[str, str, str], ...],
+    trip_type: str,
+    passengers: Tuple[int, int, int, int],
+    seat_class: str,
+    ctx: Context = None
+) -> SearchOutcome:
+    """Return the outcome of a search from the cache, an identical search in progress, or a new fetch."""
+    info = ctx.info if ctx else noop
+    seat_class = seat_class.lower()
+    
+    # Serve repeated queries from the cache instead of scraping again
+    cache_key = (legs, trip_type, passengers, seat_class)
+    cached = get_cached_flights(cache_key)
+    if cached is not None:
+        await info("Returning cached flight results")
+        return cached
+    
+    # Join an identical search that is already running instead of scraping twice
+    pending = pending_searches.get(cache_key)
+    if pending is not None:
+        await info("Waiting for an identical search in progress")
+        try:
+            return await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            # Start over if the other caller was cancelled, but not if we were too
+            # (e.g. asyncio.run cancelling every task on shutdown)
+            if not pending.cancelled() or asyncio.current_task().cancelling():
+                raise
+            return await get_flight_search(legs, trip_type, passengers, seat_class, ctx)
+    
+    pending = asyncio.get_running_loop().create_future()
+    pending_searches[cache_key] = pending
     try:
-        if ctx:
-            ctx.info("Importing fast_flights module")
-        from fast_flights import FlightData, Passengers, Result, get_flights
+        output = await search_and_cache_flights(cache_key, ctx)
+    except BaseException:
+        pending.cancel()
+        raise
+    finally:
+        del pending_searches[cache_key]
+    pending.set_result(output)
+    return output
+
+async def search_and_cache_flights(cache_key: Tuple, ctx: Context = None) -> SearchOutcome:
+    """Fetch, format and cache flights for a get_flight_search cache key."""
+    legs, trip_type, passengers, seat_class = cache_key
+    info = ctx.info if ctx else noop
+    log_error = ctx.error if ctx else noop
+    report_progress = ctx.report_progress if ctx else noop
+
+    # Import fast_flights lazily to avoid startup issues
+    try:
+        load_fast_flights()
     except ImportError as e:
         error_msg = f"Error importing fast_flights: {str(e)}"
-        if ctx:
-            ctx.error(error_msg)
-        return f"Error: Unable to import fast_flights library. Please make sure it's installed correctly. Error details: {error_msg}"
+        logger.error(error_msg)
+        await log_error(error_msg)
+        return (
+            f"Error: Unable to import fast_flights library. Please make sure it's installed correctly. Error details: {error_msg}",
+            None,
+            False
+        )
     
-    # Create flight data
     try:
-        if ctx:
-            ctx.info("Creating flight data objects")
-        
-        flight_data = [FlightData(date=departure_date, from_airport=from_airport, to_airport=to_airport)]
-        
-        # Add return flight if return_date is provided
-        if return_date:
-            flight_data.append(FlightData(date=return_date, from_airport=to_airport, to_airport=from_airport))
-        
-        # Set trip type based on whether a return date was provided
-        trip_type = "round-trip" if return_date else "one-way"
+        await info("Calling get_flights API")
+        await report_progress(0.5, 1.0)
         
-        # Create passengers object
-        passengers = Passengers(
-            adults=adults,
-            children=children,
-            infants_in_seat=infants_in_seat,
-            infants_on_lap=infants_on_lap
-        )
+        result = await fetch_flight_result(legs, trip_type, passengers, seat_class)
         
-        if ctx:
-            ctx.info("Calling get_flights API")
-            ctx.report_progress(0.5, 1.0)
-            
-        # Get flight results
-        result: Result = get_flights(
-            flight_data=flight_data,
-            trip=trip_type,
-            seat=seat_class,
-            passengers=passengers,
-            fetch_mode="fallback",  # Use fallback mode for more reliable results
-        )
+        await info("Processing flight results")
+        await report_progress(1.0, 1.0)
         
-        if ctx:
-            ctx.info("Processing flight results")
-            ctx.report_progress(1.0, 1.0)
-            
         # Format results
-        return format_flight_results(result, trip_type, DEFAULT_CONFIG["max_results"])
+        outcome = (format_flight_results(result, trip_type, DEFAULT_CONFIG["max_results"]), cheapest_price(result), True)
+        cache_flights(cache_key, outcome, FLIGHT_CACHE_TTL)
+        return outcome
         
     except Exception as e:
         error_msg = f"Error searching for flights: {str(e)}"
-        if ctx:
-            ctx.error(error_msg)
-        return error_msg
+        await log_error(error_msg)
+        # Remember failures only briefly so a broken query doesn't hammer the upstream
+        outcome = (error_msg, None, False)
+        cache_flights(cache_key, outcome, FLIGHT_CACHE_ERROR_TTL)
+        return outcome
+
+async def fetch_flight_result(
+    legs: Tuple[Tuple[str, str, str], ...],
+    trip_type: str,
+    passengers: Tuple[int, int, int, int],
+    seat_class: str
+):
+    """Build the fast_flights query objects and run the scrape off the event loop."""
+    ff = load_fast_flights()
+    
+    # Create flight data
+    flight_data = [
+        ff.FlightData(date=leg_date, from_airport=from_airport, to_airport=to_airport)
+        for leg_date, from_airport, to_airport in legs
+    ]
+    
+    # Create passengers object
+    adults, children, infants_in_seat, infants_on_lap = passengers
+    passengers_obj = ff.Passengers(
+        adults=adults,
+        children=children,
+        infants_in_seat=infants_in_seat,
+        infants_on_lap=infants_on_lap
+    )
+    
+    # Get flight results; the scrape blocks, so keep it off the event loop
+    return await fetch_with_retry(
+        ff.get_flights,
+        flight_data=flight_data,
+        trip=trip_type,
+        seat=seat_class,
+        passengers=passengers_obj,
+        fetch_mode="fallback",  # Use fallback mode for more reliable results
+    )
+
+def cheapest_price(result) -> Optional[Tuple[float, str]]:
+    """Return the lowest (amount, price label) among a result's flights, if any price parses."""
+    cheapest = None
+    for flight in getattr(result, 'flights', None) or ():
+        match = PRICE_PATTERN.search(str(flight.price))
+        if match:
+            amount = float(match.group().replace(",", ""))
+            if cheapest is None or amount < cheapest[0]:
+                cheapest = (amount, flight.price)
+    return cheapest
+
+@mcp.tool()
+async def search_flexible_dates(
+    from_airport: str,
+    to_airport: str,
+    center_date: str,
+    window_days: int = 3,
+    adults: int = 1,
+    children: int = 0,
+    infants_in_seat: int = 0,
+    infants_on_lap: int = 0,
+    seat_class: str = "economy",
+    ctx: Context = None
+) -> str:
+    """
+    Compare one-way prices for the days around a departure date.
+
+    Args:
+        from_airport: Departure airport code (3-letter IATA code, e.g., 'LAX')
+        to_airport: Arrival airport code (3-letter IATA code, e.g., 'JFK')
+        center_date: Preferred departure date in YYYY-MM-DD format
+        window_days: Days to search before and after center_date
+                     (default: 3, max: configured max_flexible_window_days)
+        adults: Number of adult passengers (default: 1)
+        children: Number of children (default: 0)
+        infants_in_seat: Number of infants in seat (default: 0)
+        infants_on_lap: Number of infants on lap (default: 0)
+        seat_class: Seat class (economy, premium-economy, business, first) (default: economy)
+
+    Returns:
+        Lowest price per date and the flights for the cheapest date
+    """
+    if ctx:
+        await ctx.info(f"Searching flexible dates from {from_airport} to {to_airport} around {center_date}")
+    
+    from_airport = from_airport.upper()
+    to_airport = to_airport.upper()
+    seat_class = normalize_seat_class(seat_class)
+    passengers = (adults, children, infants_in_seat, infants_on_lap)
+    
+    # Validate inputs
+    error = validate_search(from_airport, to_airport, center_date, None, passengers, seat_class)
+    if error:
+        return error
+    max_window = DEFAULT_CONFIG["max_flexible_window_days"]
+    if not 0 <= window_days <= max_window:
+        return f"Error: Window must be between 0 and {max_window} days."
+    
+    # Past dates can't be booked, so leave them out of the window; near the ends of the
+    # calendar the window is cut short at the first and last representable dates
+    center = date.fromisoformat(center_date)
+    today = date.today()
+    first_offset = max(-window_days, (date.min - center).days)
+    last_offset = min(window_days, (date.max - center).days)
+    days = [
+        day.isoformat()
+        for day in (center + timedelta(days=offset) for offset in range(first_offset, last_offset + 1))
+        if day >= today
+    ]
+    if not days:
+        return "Error: All dates in the window are in the past."
+    
+    try:
+        load_fast_flights()
+    except ImportError as e:
+        return f"Error: Unable to import fast_flights library. Please make sure it's installed correctly. Error details: {str(e)}"
+    
+    # Each date goes through the flight cache like a one-way search_flights call;
+    # dates that aren't cached are scraped at once, each in its own worker thread
+    outcomes = await asyncio.gather(
+        *(get_flight_search(((day, from_airport, to_airport),), "one-way", passengers, seat_class)
+          for day in days)
+    )
+    
+    summary = []
+    best = None  # (amount, day, formatted results)
+    for day, (output, price, succeeded) in zip(days, outcomes):
+        if not succeeded:
+            summary.append(f"  {day}: {output}")
+            continue
+        if price is None:
+            summary.append(f"  {day}: No prices found")
+            continue
+        summary.append(f"  {day}: {price[1]}")
+        if best is None or price[0] < best[0]:
+            best = (price[0], day, output)
+    
+    header = f"Lowest one-way prices from {from_airport} to {to_airport} around {center_date}:"
+    if best is None:
+        return "\n".join([header] + summary + ["", "No prices found for any date in the window."])
+    
+    _, best_day, best_output = best
+    return "\n".join([header] + summary + ["", f"Cheapest date: {best_day}", best_output])
+
+@mcp.tool()
+async def invalidate_flight_cache(ctx: Context = None) -> str:
+    """
+    Clear all cached flight search results.
+
+    Returns:
+        Status message with the number of cached searches removed
+    """
+    count = len(flight_cache)
+    flight_cache.clear()
+    if ctx:
+        await ctx.info(f"Cleared {count} cached flight searches")
+    return f"Cleared {count} cached flight searches."
 
 def format_flight_results(result, trip_type: str, max_results: int) -> str:
     """Format flight results into a readable string."""
-    if not result or not hasattr(result, 'flights') or not result.flights:
+    flights = getattr(result, 'flights', None)
+    if not result or not flights:
         return "No flights found matching your criteria."
     
-    output = []
-    output.append(f"Found {len(result.flights)} flight options.")
+    total = len(flights)
+    # Write lines straight into one buffer instead of collecting and joining them
+    buffer = io.StringIO()
+    write = buffer.write
+    write(f"Found {total} flight options.\n")
     
     if hasattr(result, 'current_price'):
-        output.append(f"Price assessment: {result.current_price}")
+        write(f"Price assessment: {result.current_price}\n")
     
-    output.append("\n")
+    write("\n\n")
     
-    for i, flight in enumerate(result.flights[:max_results], 1):  # Limit to max results
-        best_tag = " [BEST OPTION]" if hasattr(flight, 'is_best') and flight.is_best else ""
-        output.append(f"Option {i}{best_tag}:")
-        
-        if hasattr(flight, 'name'):
-            output.append(f"  Airline: {flight.name}")
-        
-        if hasattr(flight, 'departure'):
-            output.append(f"  Departure: {flight.departure}")
-        
-        if hasattr(flight, 'arrival'):
-            output.append(f"  Arrival: {flight.arrival}")
-        
-        if hasattr(flight, 'arrival_time_ahead') and flight.arrival_time_ahead:
-            output.append(f"  Arrives: {flight.arrival_time_ahead}")
-            
-        if hasattr(flight, 'duration'):
-            output.append(f"  Duration: {flight.duration}")
-        
-        if hasattr(flight, 'stops'):
-            output.append(f"  Stops: {flight.stops}")
-        
-        if hasattr(flight, 'delay') and flight.delay:
-            output.append(f"  Delay: {flight.delay}")
-            
-        if hasattr(flight, 'price'):
-            output.append(f"  Price: {flight.price}")
-        
-        output.append("")
+    for i, flight in enumerate(flights[:max_results], 1):  # Limit to max results
+        # fast_flights' Flight always defines the core fields; optional lines are skipped when empty
+        best_tag = " [BEST OPTION]" if flight.is_best else ""
+        arrival_time_ahead = getattr(flight, 'arrival_time_ahead', None)
+        arrives = f"  Arrives: {arrival_time_ahead}\n" if arrival_time_ahead else ""
+        delay = getattr(flight, 'delay', None)
+        delay_line = f"  Delay: {delay}\n" if delay else ""
+        write(
+            f"Option {i}{best_tag}:\n"
+            f"  Airline: {flight.name}\n"
+            f"  Departure: {flight.departure}\n"
+            f"  Arrival: {flight.arrival}\n"
+            f"{arrives}"
+            f"  Duration: {flight.duration}\n"
+            f"  Stops: {flight.stops}\n"
+            f"{delay_line}"
+            f"  Price: {flight.price}\n\n"
+        )
     
-    if len(result.flights) > max_results:
-        output.append(f"... and {len(result.flights) - max_results} more flight options available.")
+    if total > max_results:
+        write(f"... and {total - max_results} more flight options available.\n")
     
     if trip_type == "round-trip":
-        output.append("Note: Price shown is for the entire round trip.")
+        write("Note: Price shown is for the entire round trip.\n")
     
-    return "\n".join(output)
+    # Every line above ends in a newline; the joined text had no trailing one
+    return buffer.getvalue()[:-1]
 
 @mcp.tool()
-def airport_search(query: str, ctx: Context = None) -> str:
+async def airport_search(query: str, ctx: Context = None) -> str:
     """
     Search for airport codes by name or city.
 
@@ -300,26 +838,24 @@ def airport_search(query: str, ctx: Context = None) -> str:
         List of matching airports with their codes
     """
     if ctx:
-        ctx.info(f"Searching for airports matching: {query}")
+        await ctx.info(f"Searching for airports matching: {query}")
     
     if not query or len(query.strip()) < 2:
         return "Please provide at least 2 characters to search for airports."
     
     query = query.strip().upper()
-    matches = []
     
     # Search by airport code or name
-    for code, name in airports.items():
-        if query in code or query.upper() in name.upper():
-            matches.append(f"{name} ({code})")
+    with airports_lock:
+        matches = find_airports(query)
+        # Format the output (matches are already sorted)
+        shown = [f"{airports[code]} ({code})" for code in matches[:20]]  # Limit to 20 results
     
     if not matches:
         return f"No airports found matching '{query}'."
     
-    # Sort matches and format the output
-    matches.sort()
     result = [f"Found {len(matches)} airports matching '{query}':"]
-    result.extend(matches[:20])  # Limit to 20 results
+    result.extend(shown)
     
     if len(matches) > 20:
         result.append(f"...and {len(matches) - 20} more. Please refine your search to see more specific results.")
@@ -355,8 +891,8 @@ def get_travel_dates(days_from_now: Optional[int] = None, trip_length: Optional[
     departure_date = today + timedelta(days=days_from_now)
     return_date = departure_date + timedelta(days=trip_length)
     
-    departure_str = departure_date.strftime("%Y-%m-%d")
-    return_str = return_date.strftime("%Y-%m-%d")
+    departure_str = departure_date.strftime(DATE_FORMAT)
+    return_str = return_date.strftime(DATE_FORMAT)
     
     return f"Departure date: {departure_str}\nReturn date: {return_str}"
 
@@ -368,46 +904,38 @@ async def update_airports_database(ctx: Context = None) -> str:
     Returns:
         Status message with the number of airports loaded
     """
-    if ctx:
-        ctx.info("Starting airport database update")
-        ctx.report_progress(0.1, 1.0)
+    info = ctx.info if ctx else noop
+    log_error = ctx.error if ctx else noop
+    report_progress = ctx.report_progress if ctx else noop
+    
+    await info("Starting airport database update")
+    await report_progress(0.1, 1.0)
     
     try:
-        if ctx:
-            ctx.info(f"Fetching airports from {CSV_URL}")
-            ctx.report_progress(0.3, 1.0)
+        await info(f"Fetching airports from {CSV_URL}")
+        await report_progress(0.3, 1.0)
         
-        global airports
         fresh_airports = await fetch_airports_csv()
         
         if not fresh_airports:
             return "Error: Failed to fetch airports or no valid airports found"
         
         # Update the global airports dictionary
-        airports = fresh_airports
+        set_airports(fresh_airports)
         
-        if ctx:
-            ctx.report_progress(1.0, 1.0)
+        await report_progress(1.0, 1.0)
         
         return f"Successfully updated airports database with {len(airports)} airports"
     
     except Exception as e:
         error_msg = f"Error updating airports: {str(e)}"
-        if ctx:
-            ctx.error(error_msg)
+        await log_error(error_msg)
         return error_msg
 
 @mcp.resource("airports://all")
 def get_all_airports() -> str:
     """Get a list of all available airports."""
-    result = [f"Available Airports ({len(airports)} total):"]
-    for code, name in sorted(airports.items())[:100]:  # Limit to first 100 to avoid overwhelming
-        result.append(f"{code}: {name}")
-    
-    if len(airports) > 100:
-        result.append(f"... and {len(airports) - 100} more airports. Use airport_search tool to find specific airports.")
-    
-    return "\n".join(result)
+    return all_airports_text
 
 @mcp.resource("airports://{code}")
 def get_airport_info(code: str) -> str:
@@ -420,6 +948,11 @@ def get_airport_info(code: str) -> str:
 @mcp.prompt()
 def plan_trip(destination: str) -> str:
     """Create a prompt for trip planning to a specific destination."""
+    return render_plan_trip(destination)
+
+@lru_cache(maxsize=256)
+def render_plan_trip(destination: str) -> str:
+    """Render the trip planning prompt; cached since sessions often repeat destinations."""
     return f"""I'd like to plan a trip to {destination}. Can you help me with the following:
 
 1. What's the best time of year to visit {destination}?
@@ -433,6 +966,11 @@ After you answer these questions, could you help me find flights to {destination
 @mcp.prompt()
 def compare_destinations(destination1: str, destination2: str) -> str:
     """Create a prompt for comparing two travel destinations."""
+    return render_compare_destinations(destination1, destination2)
+
+@lru_cache(maxsize=256)
+def render_compare_destinations(destination1: str, destination2: str) -> str:
+    """Render the destination comparison prompt; cached like render_plan_trip."""
     return f"""I'm trying to decide between traveling to {destination1} and {destination2}. 
 Can you help me compare these destinations on the following factors:
 
@@ -448,34 +986,55 @@ After your recommendation, could you show me flight options for both destination
 # Initialize airports on startup - this is crucial
 async def initialize_airports():
     """Initialize airport data at startup."""
-    global airports
+    try:
+        # First try to load from cache, without blocking the loop on disk reads and unpickling
+        airports_data = await asyncio.to_thread(load_airports_cache)
+        is_fresh = bool(airports_data) and airports_cache_is_fresh()
+        
+        # Without a cache, use the bundled CSV before going to the network
+        if not airports_data:
+            airports_data = await asyncio.to_thread(load_bundled_airports)
+        
+        # If nothing is available locally, fetch from CSV
+        if not airports_data:
+            airports_data = await fetch_airports_csv()
+            is_fresh = True
+    finally:
+        # Startup runs on its own event loop, so release connections tied to it
+        await close_http_session()
     
-    # First try to load from cache
-    cache = load_airports_cache()
-    if cache:
-        airports = cache
+    set_airports(airports_data)
+    logger.info("Initialized with %d airports", len(airports))
     
-    # If cache is empty, fetch from CSV
-    if not airports:
-        fresh_airports = await fetch_airports_csv()
-        if fresh_airports:
-            airports = fresh_airports
+    # Local data that may be out of date is served right away and refreshed in the background;
+    # the refresh starts only now so it can't be overwritten by the data loaded above
+    if airports_data and not is_fresh:
+        refresh_airports_in_background()
+
+def refresh_airports_in_background() -> None:
+    """Re-download the airports database on a daemon thread and swap it in when done."""
+    async def refresh() -> None:
+        try:
+            airports_data = await fetch_airports_csv()
+        finally:
+            await close_http_session()
+        if airports_data:
+            set_airports(airports_data)
+            logger.info("Refreshed airports database: %d airports", len(airports_data))
     
-    print(f"Initialized with {len(airports)} airports", file=sys.stderr)
+    # The startup loop closes before the server starts, so the refresh gets a loop of its own
+    logger.info("Refreshing airports database in the background")
+    threading.Thread(target=asyncio.run, args=(refresh(),), name="airports-refresh", daemon=True).start()
 
 # Run the server
 if __name__ == "__main__":
-    print("Initializing airports database...", file=sys.stderr)
-    # Run the initialization in an event loop
-    loop = asyncio.get_event_loop()
-    loop.run_until_complete(initialize_airports())
+    logger.info("Initializing airports database...")
+    asyncio.run(initialize_airports())
     
-    print("Starting server - waiting for connections...", file=sys.stderr)
+    logger.info("Starting server - waiting for connections...")
     try:
         # This will keep the server running until interrupted
         mcp.run()
     except Exception as e:
-        print(f"Error running server: {e}", file=sys.stderr)
-        import traceback
-        traceback.print_exc(file=sys.stderr)
+        logger.exception("Error running server: %s", e)
         sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,15 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+SERVER_PATH = Path(__file__).resolve().parent.parent / "src" / "flights-mcp-server.py"
+
+
+@pytest.fixture
+def server():
+    """A freshly loaded server module; its file name isn't importable, so load it by path."""
+    spec = importlib.util.spec_from_file_location("flights_mcp_server", SERVER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,77 @@
+import asyncio
+import random
+import string
+
+WORDS = [
+    "New", "York", "Los", "Angeles", "International", "Airport", "Regional", "Field",
+    "São", "Paulo", "Zürich", "Köln", "Ho", "Chi", "Minh", "Saint", "Île", "O'Hare", "Fort",
+]
+
+
+def make_airports(rng, count=2000):
+    airports = {}
+    while len(airports) < count:
+        code = "".join(rng.choice(string.ascii_uppercase) for _ in range(3))
+        name = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+        airports[code] = f"{name}, {rng.choice(WORDS)}, {rng.choice(['US', 'BR', 'FR', 'DE', 'VN'])}"
+    return airports
+
+
+def search(server, query):
+    # FastMCP 2 wraps tool functions in objects that expose the original as .fn
+    tool = getattr(server.airport_search, "fn", server.airport_search)
+    return asyncio.run(tool(query))
+
+
+def scan(airports, query):
+    """Reference implementation: check every airport, sorted by display line."""
+    return tuple(
+        code
+        for _, code in sorted(
+            (f"{name} ({code})", code)
+            for code, name in airports.items()
+            if query in code or query in name.upper()
+        )
+    )
+
+
+def test_find_airports_matches_full_scan(server):
+    rng = random.Random(5)
+    airports = make_airports(rng)
+    server.set_airports(airports)
+    entries = list(airports.items())
+
+    for _ in range(3000):
+        code, name = rng.choice(entries)
+        source = rng.choice([code, name.upper()])
+        length = rng.randint(1, 8)
+        start = rng.randint(0, max(0, len(source) - length))
+        query = source[start:start + length]
+        if rng.random() < 0.1:
+            query += rng.choice(["Q", "Ø", " "])
+        assert server.find_airports(query) == scan(airports, query), query
+
+
+def test_set_airports_replaces_index_and_memoized_results(server):
+    server.set_airports({"JFK": "John F Kennedy International, New York, US"})
+    assert server.find_airports("KENNEDY") == ("JFK",)
+
+    server.set_airports({"LGA": "LaGuardia, New York, US"})
+    assert server.find_airports("KENNEDY") == ()
+    assert server.find_airports("NEW YORK") == ("LGA",)
+
+
+def test_airport_search_lists_first_matches_in_display_order(server):
+    airports = {f"A{a}{b}": f"Alpha {a}{b}, Town, US" for a in "BCDEF" for b in "XYZ"}
+    airports.update({f"Z{a}{b}": f"Zulu {a}{b}, Town, US" for a in "BCDEF" for b in "XYZ"})
+    airports["QQQ"] = "Other Field, Village, US"
+    server.set_airports(airports)
+
+    lines = search(server, " alpha ").split("\n")
+    assert lines[0] == "Found 15 airports matching 'ALPHA':"
+    assert lines[1:] == [f"Alpha {a}{b}, Town, US (A{a}{b})" for a in "BCDEF" for b in "XYZ"]
+
+    lines = search(server, "town").split("\n")
+    assert lines[0] == "Found 30 airports matching 'TOWN':"
+    assert lines[1:21] == sorted(f"{name} ({code})" for code, name in airports.items() if code != "QQQ")[:20]
+    assert lines[21] == "...and 10 more. Please refine your search to see more specific results."
@@ -0,0 +1,112 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+LEG = (("2030-05-01", "JFK", "LAX"),)
+PASSENGERS = (1, 0, 0, 0)
+
+
+@pytest.fixture
+def fetches(server, monkeypatch):
+    """Replace the scrape with one that records its calls and waits until released."""
+    calls = []
+    release = asyncio.Event()
+
+    async def fetch_flight_result(legs, trip_type, passengers, seat_class):
+        calls.append(legs)
+        await release.wait()
+        flight = SimpleNamespace(
+            is_best=True, name="Delta", departure="10:00 AM", arrival="1:00 PM",
+            duration="3 hr", stops=0, price="$120"
+        )
+        return SimpleNamespace(current_price="typical", flights=[flight])
+
+    monkeypatch.setattr(server, "load_fast_flights", lambda: None)
+    monkeypatch.setattr(server, "fetch_flight_result", fetch_flight_result)
+    return SimpleNamespace(calls=calls, release=release)
+
+
+async def settle():
+    # Let started tasks run up to the point where they wait on the scrape
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def search(server, legs=LEG):
+    return asyncio.create_task(server.run_flight_search(legs, "one-way", PASSENGERS, "economy"))
+
+
+def test_identical_concurrent_searches_share_one_fetch(server, fetches):
+    async def main():
+        tasks = [search(server) for _ in range(4)]
+        other = search(server, (("2030-05-02", "JFK", "LAX"),))
+        await settle()
+        assert len(fetches.calls) == 2
+        fetches.release.set()
+        outputs = await asyncio.gather(*tasks, other)
+        assert len(set(outputs[:4])) == 1
+        assert "Price: $120" in outputs[0]
+        assert not server.pending_searches
+
+        # Later identical searches are served from the cache
+        assert await search(server) == outputs[0]
+        assert len(fetches.calls) == 2
+
+    asyncio.run(main())
+
+
+def test_waiter_restarts_search_when_first_caller_is_cancelled(server, fetches):
+    async def main():
+        first = search(server)
+        await settle()
+        waiter = search(server)
+        await settle()
+        first.cancel()
+        await settle()
+        fetches.release.set()
+
+        output = await waiter
+        assert "Price: $120" in output
+        assert first.cancelled()
+        assert len(fetches.calls) == 2
+        assert not server.pending_searches
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_does_not_affect_first_caller(server, fetches):
+    async def main():
+        first = search(server)
+        await settle()
+        waiter = search(server)
+        await settle()
+        waiter.cancel()
+        await settle()
+        fetches.release.set()
+
+        assert "Price: $120" in await first
+        assert waiter.cancelled()
+        assert len(fetches.calls) == 1
+        assert not server.pending_searches
+
+    asyncio.run(main())
+
+
+def test_waiter_cancelled_with_first_caller_does_not_restart(server, fetches):
+    async def main():
+        first = search(server)
+        await settle()
+        waiter = search(server)
+        await settle()
+        # Both are cancelled in the same loop iteration, as on shutdown
+        first.cancel()
+        waiter.cancel()
+        await settle()
+
+        assert first.cancelled()
+        assert waiter.cancelled()
+        assert len(fetches.calls) == 1
+        assert not server.pending_searches
+
+    asyncio.run(main())
@@ -0,0 +1,22 @@
+import sys
+
+
+def test_parse_airports_csv_formats_and_filters_rows(server):
+    data = (
+        "icao,iata,name,city,country\n"
+        "KJFK,JFK,John F Kennedy International,New York,US\n"
+        "EGLL,LHR,Heathrow,,GB\n"
+        "XXXX,,No Code,Nowhere,US\n"
+        "YYYY,abc,Lower Case,Somewhere,US\n"
+    ).encode()
+    assert server.parse_airports_csv(data) == {
+        "JFK": "John F Kennedy International, New York, US",
+        "LHR": "Heathrow, GB",
+    }
+
+
+def test_parse_airports_csv_tolerates_missing_columns(server, monkeypatch):
+    # pyarrow rejects a header without every column and hands the data to the csv module
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    data = b"iata,name,country\nJFK,Kennedy,US\nLAX,Los Angeles\n"
+    assert server.parse_airports_csv(data) == {"JFK": "Kennedy, US", "LAX": "Los Angeles, "}